@@ -0,0 +1,34 @@
+"""Deinterleave 16-bit audio chunks into planar per-channel buffers.
+
+numba is optional: when it is installed the copy is compiled to a tight
+native loop, otherwise a single numpy transpose copy is used.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _deinterleave_numpy(src, dst, offset):
+    dst[:, offset:offset + src.shape[0]] = src.T
+
+
+if njit is not None:
+    @njit(cache=True)
+    def deinterleave_i16(src, dst, offset):
+        """Copy an interleaved chunk into planar channel buffers.
+
+        Args:
+            src (np.ndarray): The interleaved int16 chunk, shaped (frames, channels).
+            dst (np.ndarray): The planar int16 buffer, shaped (channels, total_frames).
+            offset (int): The frame offset in dst to start writing at.
+
+        """
+        n, channels = src.shape
+        for i in range(n):
+            for j in range(channels):
+                dst[j, offset + i] = src[i, j]
+else:
+    deinterleave_i16 = _deinterleave_numpy
@@ -1,31 +1,68 @@
 import os
-import wave
+import struct
+import shutil
 import pyaudio
 import numpy as np
+from _deinterleave import deinterleave_i16
 import time
 import datetime
 import argparse
+import queue
+import threading
+import sys
+
+# Canonical 44-byte RIFF/WAVE header for uncompressed PCM
+WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+def set_realtime_priority(priority):
+    """Raise the calling thread to real-time scheduling priority.
+
+    Uses SCHED_FIFO on Linux and THREAD_PRIORITY_TIME_CRITICAL on Windows.
+    Other platforms are left unchanged.
+
+    Args:
+        priority (int): The SCHED_FIFO priority to use on Linux (1-99).
+
+    Returns:
+        bool: True if the priority was raised, False if it failed, None if the platform is not supported.
+
+    """
+    try:
+        if sys.platform.startswith('linux'):
+            # On Linux pid 0 refers to the calling thread only
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            return True
+        if sys.platform == 'win32':
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            return bool(kernel32.SetThreadPriority(kernel32.GetCurrentThread(), 15))  # THREAD_PRIORITY_TIME_CRITICAL
+        return None  # Not attempted on other platforms
+    except OSError:
+        pass  # Usually missing privileges (e.g. no CAP_SYS_NICE / rtprio limit)
+    return False
 
 class Recorder:
     """Audio recorder utility.
 
     Args:
-        sample_format (int, optional): The sample format for audio recording. Defaults to pyaudio.paInt16.
+        sample_format (int, optional): The sample format for audio recording. Only pyaudio.paInt16 is supported. Defaults to pyaudio.paInt16.
         channels (int, optional): The number of audio channels to record. Defaults to 2.
         chunk (int, optional): The chunk size for audio recording. Defaults to 1024.
         choice (bool, optional): Flag indicating whether to prompt for input device selection. Defaults to False.
         main_save_path (str, optional): The main directory path for saving audio recordings. Defaults to None.
         backup_path (str, optional): The backup directory path for saving audio recordings. Defaults to None.
         suffix (str, optional): The suffix to append to the filename of the recordings. Defaults to '_channel_'.
+        ring_chunks (int, optional): The number of chunks the capture ring buffer can hold. Defaults to 16.
+        rt_priority (int, optional): Real-time priority for the audio callback thread, or None to keep the default. Defaults to None.
 
     Raises:
-        Exception: If the input device ID is invalid.
+        Exception: If the sample format is not pyaudio.paInt16 or the input device ID is invalid.
 
     Attributes:
         sample_format (int): The sample format for audio recording.
         channels (int): The number of audio channels to record.
         chunk (int): The chunk size for audio recording.
-        frames (list): A list to store audio frames for each channel.
+        frames (list): A list holding one buffer of 16-bit samples per channel.
         p (pyaudio.PyAudio): The PyAudio instance.
         choice (bool): Flag indicating whether to prompt for input device selection.
         input_device_index (int): The index of the selected input device.
@@ -33,23 +70,47 @@ class Recorder:
         main_save_path (str): The main directory path for saving audio recordings.
         backup_path (str): The backup directory path for saving audio recordings.
         suffix (str): The suffix to append to the filename of the recordings.
+        ring_chunks (int): The number of chunks the capture ring buffer can hold.
+        rt_priority (int): Real-time priority for the audio callback thread, or None to keep the default.
+        rt_priority_active (bool): Whether the current stream's callback thread got real-time priority, None if not attempted.
+        overruns (int): The number of chunks dropped because the ring buffer was full.
+        input_overflows (int): The number of callbacks PortAudio flagged with an input overflow.
+        _known_dirs (set): Directories already created during this session.
+        stream (pyaudio.Stream): The long-lived input stream, opened on first use.
+        _io_q (queue.SimpleQueue): Recordings waiting to be written to disk.
+        _io_thread (threading.Thread): The background thread writing recordings to disk, started on first use.
+        _io_error (Exception): The first error the background thread hit while saving, if any.
 
     Methods:
+        get_devices(): Return the cached list of audio devices.
         get_input_device_index(): Prompt the user to select an input device and return its index.
         validate_device_index(index): Validate if the provided device index is valid.
         get_device_sample_rate(): Get the sample rate of the selected input device.
+        _stream_callback(in_data, frame_count, time_info, status): Copy captured audio into the ring buffer.
+        open_stream(): Open and start the input stream if it is not already running.
+        close(): Stop and close the input stream and wait for pending saves.
         record_audio(rec_length): Record audio for the specified length of time.
-        save_wav(filename, frames, date_as_string, time_as_string, directory_path): Save audio frames as a WAV file.
+        save_wav(filename, frames, date_as_string, time_as_string, directory_path, seq): Save audio frames as a WAV file.
+        _wav_header(data_size): Build the 44-byte PCM WAV header for a mono recording of data_size bytes.
+        _write_parts(path, parts): Write a list of buffers to a file, using a single writev call where available.
+        _ensure_dir(directory): Create a directory once per session.
+        mirror_file(src_path, date_as_string, directory_path): Mirror a saved file into another directory.
+        _io_worker(): Write queued recordings to disk until a stop sentinel is received.
+        flush(): Wait until every queued recording has been written to disk.
         record_and_save(rec_length, rooms_names): Record audio and save the WAV files for each room.
         start_recording(num_rec, recording_length, rooms_names, time_unit): Start recording audio for the specified duration.
 
     """
-    def __init__(self, sample_format=pyaudio.paInt16, channels=2, chunk=1024, choice=False, main_save_path=None, backup_path=None, suffix='_channel_'):
+    _device_cache = None  # (index, info) for every device, shared by all instances
+
+    def __init__(self, sample_format=pyaudio.paInt16, channels=2, chunk=1024, choice=False, main_save_path=None, backup_path=None, suffix='_channel_', ring_chunks=16, rt_priority=None):
         # Initialize 
+        if sample_format != pyaudio.paInt16:
+            raise Exception(f'Unsupported sample format: {sample_format} (only pyaudio.paInt16 is supported)')
         self.sample_format = sample_format
         self.channels = channels
         self.chunk = chunk
-        self.frames = [[] for _ in range(channels)]
+        self.frames = [bytearray() for _ in range(channels)]
         self.p = pyaudio.PyAudio()
         self.choice = choice
         self.input_device_index = self.get_input_device_index()
@@ -60,7 +121,46 @@ class Recorder:
         self.main_save_path = main_save_path
         self.backup_path = backup_path
         self.suffix = suffix  # Added suffix
+        # Single-producer/single-consumer ring buffer filled by the PortAudio callback
+        self.ring_chunks = ring_chunks
+        self._ring = np.empty((ring_chunks * chunk, channels), dtype=np.int16)
+        self._ring_bytes = memoryview(self._ring).cast('B')  # Raw byte view, same interleaved layout as in_data
+        self._slot_bytes = chunk * channels * 2
+        if channels > 2:
+            # Compile the deinterleaver now rather than on the first captured chunk
+            deinterleave_i16(self._ring[:1], np.empty((channels, 1), dtype=np.int16), 0)
+        self._write_idx = 0  # Chunks written by the callback (producer only)
+        self._read_idx = 0  # Chunks consumed by record_audio (consumer only)
+        self.overruns = 0
+        self.input_overflows = 0
+        self.rt_priority = rt_priority
+        self._priority_pending = False  # Armed by open_stream, raised from inside the callback thread on first call
+        self.rt_priority_active = None
+        self._priority_warned = False
+        self._seq = 0  # Recording counter used in filenames
+        self._known_dirs = set()  # Avoid a stat/mkdir for every saved file
+        self.stream = None
+        # Disk writes run on a worker thread so saving overlaps the next recording
+        self._io_q = queue.SimpleQueue()
+        self._io_thread = None  # Started by record_and_save, stopped by flush()
+        self._io_error = None
         
+    def get_devices(self):
+        """Return the cached list of audio devices.
+
+        The devices are enumerated through PortAudio on first use and reused by
+        every Recorder afterwards. Devices connected after the cache was filled are
+        therefore not listed until start_recording terminates the PyAudio session,
+        which clears the cache.
+
+        Returns:
+            list: (index, device_info) tuples for every device.
+
+        """
+        if Recorder._device_cache is None:
+            Recorder._device_cache = [(i, self.p.get_device_info_by_index(i)) for i in range(self.p.get_device_count())]
+        return Recorder._device_cache
+
     def get_input_device_index(self):
         """Prompt the user to select an input device and return its index.
 
@@ -72,11 +172,9 @@ class Recorder:
 
         """
         valid_indexes = []
-        for i in range(self.p.get_device_count()):
-            device_info = self.p.get_device_info_by_index(i)
+        for i, device_info in self.get_devices():
             if (device_info["maxInputChannels"]) > 0:
                 valid_indexes.append(i)
-                print("Input Device id ", i, " - ", device_info["name"])
                 print(f"Input Device id {i} - {device_info['name']} - Channels: {device_info['maxInputChannels']}")
 
         if not valid_indexes:
@@ -102,16 +200,77 @@ class Recorder:
 
         """
         try:
-            self.p.get_device_info_by_index(index)
+            self.p.get_device_info_by_index(index)  # Query the live session, not the cache
             return True
         except Exception:
             return False
 
     def get_device_sample_rate(self):
-        device_info = self.p.get_device_info_by_index(self.input_device_index)
+        device_info = self.get_devices()[self.input_device_index][1]  # Cache is ordered by device index
         print(int(device_info['defaultSampleRate']))
         return int(device_info['defaultSampleRate'])
 
+    def _stream_callback(self, in_data, frame_count, time_info, status):
+        """Copy captured audio into the ring buffer.
+
+        Runs on the PortAudio thread, so it only copies into preallocated memory
+        and never blocks. If the consumer falls behind the chunk is dropped.
+
+        Returns:
+            tuple: (None, pyaudio.paContinue) to keep the stream running.
+
+        """
+        if status & pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        if self._priority_pending:
+            self._priority_pending = False
+            self.rt_priority_active = set_realtime_priority(self.rt_priority)  # Reported by record_audio
+        write_idx = self._write_idx
+        if write_idx - self._read_idx >= self.ring_chunks:
+            self.overruns += 1
+            return (None, pyaudio.paContinue)
+        # in_data is already laid out like a ring slot, so a plain byte copy is enough (no numpy objects)
+        off = (write_idx % self.ring_chunks) * self._slot_bytes
+        self._ring_bytes[off:off + len(in_data)] = in_data
+        self._write_idx = write_idx + 1  # Publish the chunk only after it is fully copied
+        return (None, pyaudio.paContinue)
+
+    def open_stream(self):
+        """Open and start the input stream if it is not already running.
+
+        The stream stays open across recordings so there is no device setup
+        latency or gap in the audio between consecutive calls to record_audio.
+
+        Returns:
+            pyaudio.Stream: The running input stream.
+
+        """
+        if self.stream is None:
+            self._write_idx = self._read_idx = 0
+            self._priority_pending = self.rt_priority is not None  # A new stream gets a new callback thread
+            self.rt_priority_active = None
+            self._priority_warned = False
+            self.stream = self.p.open(format=self.sample_format,
+                                      channels=self.channels,
+                                      rate=self.fs,
+                                      input_device_index=self.input_device_index,
+                                      frames_per_buffer=self.chunk,
+                                      input=True,
+                                      stream_callback=self._stream_callback)
+        return self.stream
+
+    def close(self):
+        """Stop and close the input stream and wait for pending saves.
+
+        Raises:
+            Exception: The first error that occurred while saving queued recordings.
+
+        """
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        self.flush()
 
     def record_audio(self, rec_length):
         """Record audio for the specified length of time.
@@ -120,75 +279,210 @@ class Recorder:
             rec_length (int): The length of time to record in seconds.
 
         Raises:
-            Exception: If the number of channels is invalid.
+            Exception: If the number of channels is invalid or the input stream stops delivering audio.
 
         """
         if self.channels < 1:
             raise Exception(f'Invalid number of channels: {self.channels}')
         print('Recording')
-        self.frames = [[] for _ in range(self.channels)]  # Clear frames
-        stream = self.p.open(format=self.sample_format,
-                            channels=self.channels,
-                            rate=self.fs,
-                            input_device_index=self.input_device_index,
-                            frames_per_buffer=self.chunk,
-                            input=True)
-
-        for i in range(0, int(self.fs / self.chunk * rec_length)):
-            data = stream.read(self.chunk)
-            data_array = np.frombuffer(data, dtype='int16')  # Use frombuffer instead of fromstring
-            for j in range(self.channels):
-                channel = data_array[j::self.channels]
-                data_str = channel.tobytes()  # Use tobytes instead of tostring
-                self.frames[j].append(data_str)
-
-        stream.stop_stream()
-        stream.close()
+        chunk = self.chunk
+        channels = self.channels
+        # Integer math only, so the buffers below are sized exactly (int() still allows fractional lengths)
+        num_chunks = int(self.fs * rec_length) // chunk
+        total_samples = num_chunks * chunk
+        total_bytes = total_samples * 2  # 16-bit samples
+        # Preallocate one planar buffer holding every channel back to back
+        backing = bytearray(total_bytes * channels)
+        planar = np.frombuffer(backing, dtype=np.int16).reshape(channels, total_samples)
+        channel_views = list(planar)  # Writable int16 view of each channel
+        mv = memoryview(backing)
+        self.frames = [mv[j * total_bytes:(j + 1) * total_bytes] for j in range(channels)]
+        stream = self.open_stream()  # Continues from the ring where the previous recording stopped
+        overruns_start = self.overruns
+        overflows_start = self.input_overflows
+
+        # Bind hot-loop lookups to locals once
+        ring = self._ring
+        ring_chunks = self.ring_chunks
+        sleep = time.sleep
+        wait = chunk / self.fs / 2
+        stall_timeout = max(2.0, 4 * chunk / self.fs)
+        read_idx = self._read_idx
+        for off in range(0, total_samples, chunk):
+            if read_idx == self._write_idx:  # Ring is empty, wait for the callback
+                deadline = time.monotonic() + stall_timeout
+                while read_idx == self._write_idx:
+                    if not stream.is_active():
+                        raise Exception('Input stream stopped unexpectedly')
+                    if time.monotonic() > deadline:
+                        raise Exception(f'No audio received for {stall_timeout:.1f} seconds')
+                    sleep(wait)
+            src = (read_idx % ring_chunks) * chunk
+            block = ring[src:src + chunk]
+            if channels == 1:
+                channel_views[0][off:off + chunk] = block.ravel()  # Already deinterleaved, plain copy
+            elif channels == 2:
+                channel_views[0][off:off + chunk] = block[:, 0]
+                channel_views[1][off:off + chunk] = block[:, 1]
+            else:
+                deinterleave_i16(block, planar, off)
+            read_idx += 1
+            self._read_idx = read_idx  # Release the slot to the callback
+
         print('Finished recording')
+        dropped = self.overruns - overruns_start
+        overflows = self.input_overflows - overflows_start
+        if dropped or overflows:
+            print(f'Warning: recording has gaps ({dropped} chunks dropped, {overflows} input overflows)')
+        if self.rt_priority_active is False and not self._priority_warned:
+            self._priority_warned = True  # Once per stream
+            print(f'Warning: could not set real-time priority {self.rt_priority} for the audio thread')
 
 
-    def save_wav(self, filename, frames, date_as_string, time_as_string, directory_path):
+    def save_wav(self, filename, frames, date_as_string, time_as_string, directory_path, seq=0):
         """Save audio frames as a WAV file.
 
         Args:
             filename (str): The base filename for the WAV file.
-            frames (list): The audio frames to be saved.
+            frames (bytes-like): The 16-bit audio samples to be saved.
             date_as_string (str): The current date as a string.
             time_as_string (str): The current time as a string.
             directory_path (str): The directory path for saving the WAV file.
+            seq (int, optional): The recording sequence number, keeps filenames unique and sortable. Defaults to 0.
+
+        Returns:
+            str: The full path of the written WAV file.
 
         """
-        name_of_file = filename + time_as_string.replace('.', '') + '.wav'
+        name_of_file = f'{filename}{time_as_string}_{seq:05d}.wav'
         directory = directory_path + date_as_string
-        if not os.path.isdir(directory):
-            os.makedirs(directory)
+        self._ensure_dir(directory)
 
         complete_name = os.path.join(directory, name_of_file)
 
-        wf = wave.open(complete_name, 'wb')
-        wf.setnchannels(1)
-        wf.setsampwidth(self.p.get_sample_size(self.sample_format))
-        wf.setframerate(self.fs)
-        wf.writeframes(b''.join(frames))
-        wf.close()
+        payload = memoryview(frames).cast('B')
+        self._write_parts(complete_name, [memoryview(self._wav_header(len(payload))), payload])
+        return complete_name
+
+    def _wav_header(self, data_size):
+        """Build the 44-byte PCM WAV header for a mono recording of data_size bytes.
+
+        The data size is known up front, so the header is written once instead of patched.
+        """
+        return WAV_HEADER.pack(b'RIFF', 36 + data_size, b'WAVE',
+                               b'fmt ', 16, 1, 1, self.fs, self.fs * 2, 2, 16,  # Mono 16-bit PCM
+                               b'data', data_size)
+
+    @staticmethod
+    def _write_parts(path, parts):
+        """Write a list of buffers to a file, using a single writev call where available."""
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            while parts:
+                written = os.writev(fd, parts) if hasattr(os, 'writev') else os.write(fd, parts[0])
+                # Drop fully written buffers and trim a partially written one
+                while parts and written >= len(parts[0]):
+                    written -= len(parts[0])
+                    parts.pop(0)
+                if parts:
+                    parts[0] = parts[0][written:]
+        finally:
+            os.close(fd)
+
+    def _ensure_dir(self, directory):
+        """Create a directory once per session."""
+        if directory not in self._known_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._known_dirs.add(directory)
+
+    def mirror_file(self, src_path, date_as_string, directory_path):
+        """Mirror a saved file into another directory.
+
+        The file is hard-linked when possible, so its bytes are written only once.
+        If linking is not supported (e.g. the directories are on different devices)
+        the file is copied instead.
+
+        Args:
+            src_path (str): The path of the file to mirror.
+            date_as_string (str): The current date as a string.
+            directory_path (str): The directory path to mirror the file into.
+
+        Returns:
+            str: The full path of the mirrored file.
+
+        """
+        directory = directory_path + date_as_string
+        self._ensure_dir(directory)
+        dst_path = os.path.join(directory, os.path.basename(src_path))
+        try:
+            os.link(src_path, dst_path)
+        except OSError:
+            shutil.copyfile(src_path, dst_path)  # Uses the kernel's copy fast path where available
+        return dst_path
+
+    def _io_worker(self):
+        """Write queued recordings to disk until a stop sentinel is received."""
+        while True:
+            item = self._io_q.get()
+            if item is None:
+                break
+            frames, rooms_names, date_str, time_str, seq = item
+            try:
+                for i, name in enumerate(rooms_names):
+                    saved_path = self.save_wav(name +  self.suffix, frames[i], date_str, time_str, self.main_save_path, seq)
+                    self.mirror_file(saved_path, date_str, self.backup_path)
+            except Exception as e:
+                print(f"An error of type {type(e).__name__} occurred while saving: {e}")
+                if self._io_error is None:
+                    self._io_error = e  # Re-raised on the recording thread
+
+    def _raise_io_error(self):
+        """Re-raise the first error the background thread hit while saving."""
+        if self._io_error is not None:
+            error, self._io_error = self._io_error, None
+            raise error
+
+    def flush(self):
+        """Wait until every queued recording has been written to disk.
+
+        Raises:
+            Exception: The first error that occurred while saving queued recordings.
+
+        """
+        if self._io_thread is not None:
+            self._io_q.put(None)  # Let the worker finish pending saves, then stop
+            self._io_thread.join()
+            self._io_thread = None
+        self._raise_io_error()
 
     def record_and_save(self, rec_length, rooms_names):
-        """Record audio and save the WAV files for each room.
+        """Record audio and queue the WAV files for each room to be saved.
+
+        The files are written by a background thread, so this returns as soon
+        as the recording is finished. Call flush() or close() to wait for them.
 
         Args:
             rec_length (int): The length of time to record in seconds.
             rooms_names (list): The names of the rooms to record.
 
+        Raises:
+            Exception: If saving a previous recording failed.
+
         """
+        self._raise_io_error()  # Stop instead of recording for hours while nothing is saved
+        if self._io_thread is None:
+            self._io_thread = threading.Thread(target=self._io_worker, daemon=True)
+            self._io_thread.start()
 
         self.record_audio(rec_length)
-        current_time = str(time.time())
-        date_today = datetime.datetime.now()
-        date_str = str(date_today.date())
-
-        for i, name in enumerate(rooms_names):
-            self.save_wav(name +  self.suffix, self.frames[i], date_str, current_time, self.main_save_path)
-            self.save_wav(name +  self.suffix, self.frames[i], date_str, current_time, self.backup_path)
+        # Format the timestamp once per recording; the counter keeps names unique
+        now = datetime.datetime.now()
+        date_str = now.strftime('%Y-%m-%d')
+        time_str = now.strftime('%H%M%S%f')
+        self._seq += 1
+
+        # record_audio allocates fresh buffers each call, so the worker can own these
+        self._io_q.put((self.frames, rooms_names, date_str, time_str, self._seq))
         
     def start_recording(self, num_rec, recording_length, rooms_names, time_unit="seconds"):
         """Start recording audio for the specified duration and convert num_rec to the appropriate time unit.
@@ -199,6 +493,9 @@ class Recorder:
             rooms_names (list): The names of the rooms to record.
             time_unit (str): The unit of recording time (default: "seconds").
 
+        Raises:
+            Exception: If saving a recording failed.
+
         """
         if time_unit == "minutes":
             num_rec *= 60
@@ -206,10 +503,17 @@ class Recorder:
             num_rec *= 3600
 
         num_loops = num_rec // recording_length  # Calculate the number of loops needed
-        for k in range(num_loops):
-            print('This is recording number :', k + 1)
-            self.record_and_save(rec_length=recording_length, rooms_names=rooms_names)
-        self.p.terminate()  # Terminate PyAudio session after loop
+        try:
+            for k in range(num_loops):
+                print('This is recording number :', k + 1)
+                self.record_and_save(rec_length=recording_length, rooms_names=rooms_names)
+        finally:
+            # Also runs on errors and Ctrl-C, so finished recordings still reach the disk
+            try:
+                self.close()  # Waits for pending saves and re-raises a save error
+            finally:
+                self.p.terminate()  # Terminate PyAudio session after loop
+                Recorder._device_cache = None  # Indexes are only valid for the terminated session
 
 class DirectoryManager:
     """Utility class for managing directory paths.
@@ -255,6 +559,7 @@ if __name__ == "__main__":
     parser.add_argument('--channels_names', default='channel_1,channel_2', help='Names of the channels')
     parser.add_argument('--channels', type=int, default=2, help='Number of audio channels to record')
     parser.add_argument('--suffix', default='_channel_', help='Suffix to append to the filename of the recordings')
+    parser.add_argument('--rt_priority', type=int, default=None, help='Real-time priority for the audio thread (requires privileges)')
     args = parser.parse_args()
 
     channels_names = args.channels_names.split(',')
@@ -272,7 +577,7 @@ if __name__ == "__main__":
     print(dir_manager.main_save_path)  # Outputs the main directory path
     print(dir_manager.backup_path)  # Outputs the backup directory path
 
-    recorder = Recorder(channels=args.channels, choice=True, main_save_path=dir_manager.main_save_path, backup_path=dir_manager.backup_path, suffix=args.suffix)
+    recorder = Recorder(channels=args.channels, choice=True, main_save_path=dir_manager.main_save_path, backup_path=dir_manager.backup_path, suffix=args.suffix, rt_priority=args.rt_priority)
     try:
         recorder.start_recording(args.recording_time, args.recording_length, channels_names, time_unit=args.recording_unit)
     except Exception as e: